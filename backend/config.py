@@ -45,6 +45,23 @@ VECTORSTORE_CONFIG = {
     'persist_directory': str(PROCESSED_DIR / 'chroma_db')
 }
 
+# Shared Index Configuration
+# When enabled, workers search a read-only mmap export of the vector store
+# published by `python -m services.shared_index` instead of opening Chroma.
+SHARED_INDEX_CONFIG = {
+    'enabled': os.getenv('SHARED_INDEX', 'false').lower() == 'true',
+    'index_directory': os.getenv('SHARED_INDEX_DIR', str(PROCESSED_DIR / 'shared_index'))
+}
+
+# Query Log Configuration
+# Opt-in capture of /chat traffic for debugging and replay with replay.py
+QUERY_LOG_CONFIG = {
+    'enabled': os.getenv('QUERY_LOG', 'false').lower() == 'true',
+    'path': os.getenv('QUERY_LOG_PATH', str(DATA_DIR / 'query_logs' / 'queries.jsonl')),
+    'max_bytes': int(os.getenv('QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024)),
+    'backup_count': int(os.getenv('QUERY_LOG_BACKUP_COUNT', 5))
+}
+
 # API Keys
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 
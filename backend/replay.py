@@ -0,0 +1,341 @@
+"""Replay a captured query log against the ASGI app.
+
+Usage:
+    python replay.py run data/query_logs/queries.jsonl --speed 2 --output build_a.jsonl
+    python replay.py diff build_a.jsonl build_b.jsonl
+
+Requests are sent in-process to `main:app` with the original inter-arrival
+times divided by `--speed`. Gemini generation is replaced by a local stand-in.
+Each distinct question is embedded once with the real embedding model and
+cached in `--embeddings-cache`; later runs read the cache, so they need no API
+key, stay deterministic across builds and still retrieve meaningful chunks.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import logging.config
+import math
+import os
+import time
+from types import SimpleNamespace
+from typing import List, Dict, Any, Optional, Iterable, Union
+
+import httpx
+from fastapi import Request
+from langchain_core.embeddings import Embeddings
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+from config import GEMINI_API_KEY, VECTORSTORE_CONFIG, SHARED_INDEX_CONFIG, LOGGING_CONFIG
+from main import app
+from services.document_processor import Retriever
+from services.query_log import get_query_logger, read_query_log
+from services.rag import RAGPipeline, get_rag_pipeline
+from services.shared_index import SharedIndexRetriever
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Must match the model the retrievers embed queries with
+EMBEDDING_MODEL = "models/embedding-001"
+
+class CachedEmbeddings(Embeddings):
+    """Query embeddings looked up from the replay embeddings cache"""
+
+    def __init__(self, vectors: Dict[str, List[float]]):
+        self.vectors = vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        if text not in self.vectors:
+            raise KeyError(f"No cached embedding for question: {text!r}")
+        return self.vectors[text]
+
+def prepare_embeddings(cache_path: str, questions: Iterable[str], embedding_function: Optional[Embeddings] = None) -> Dict[str, List[float]]:
+    """Load cached query embeddings, embedding questions not seen before once with the real model"""
+    cache = {'model': EMBEDDING_MODEL, 'vectors': {}}
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache['model'] != EMBEDDING_MODEL:
+            raise SystemExit(f"{cache_path} holds {cache['model']} embeddings but the retrievers use {EMBEDDING_MODEL}")
+
+    missing = sorted(set(questions) - cache['vectors'].keys())
+    if missing:
+        if embedding_function is None:
+            if not GEMINI_API_KEY:
+                raise SystemExit(f"{len(missing)} questions are not in {cache_path}; set GEMINI_API_KEY once to embed them")
+            embedding_function = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=GEMINI_API_KEY)
+
+        logger.info(f"Embedding {len(missing)} new questions into {cache_path}")
+        for question in missing:
+            cache['vectors'][question] = embedding_function.embed_query(question)
+
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        with open(f"{cache_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(cache, f, separators=(',', ':'), ensure_ascii=False)
+        os.replace(f"{cache_path}.tmp", cache_path)
+
+    return cache['vectors']
+
+class StubGenerativeModel:
+    """Local stand-in for the Gemini model with a fixed response latency"""
+
+    def __init__(self, delay_ms: float):
+        self.delay_ms = delay_ms
+
+    def generate_content(self, prompt: str) -> Any:
+        # Blocks like the real client does, so event loop contention is preserved
+        time.sleep(self.delay_ms / 1000)
+        answer = "Replayed answer."
+        return SimpleNamespace(
+            text=answer,
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=len(prompt.split()),
+                candidates_token_count=len(answer.split())
+            )
+        )
+
+# Header carrying the position of each replayed request, so traces can be matched to it
+REPLAY_ID_HEADER = 'X-Replay-Id'
+
+class RecordingQueryLogger:
+    """Stores the query trace of one replayed request under its replay ID"""
+
+    def __init__(self, traces: Dict[int, Dict[str, Any]], replay_id: int):
+        self.traces = traces
+        self.replay_id = replay_id
+
+    def log(self, question: str, trace: Dict[str, Any], received_at: float, total_ms: float, error: Optional[str] = None) -> None:
+        self.traces[self.replay_id] = trace
+
+def jaccard(before: List[Any], after: List[Any]) -> float:
+    """Overlap between two retrieved chunk id lists"""
+    union = set(before) | set(after)
+    return len(set(before) & set(after)) / len(union) if union else 1.0
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, math.ceil(q / 100 * len(ordered)) - 1)
+    return round(ordered[index], 2)
+
+def latency_summary(latencies: List[float]) -> Dict[str, Optional[float]]:
+    summary = {f"p{q}": percentile(latencies, q) for q in (50, 90, 95, 99)}
+    summary["max"] = round(max(latencies), 2) if latencies else None
+    return summary
+
+def index_dimension(retriever: Union[Retriever, SharedIndexRetriever]) -> int:
+    """Embedding dimension of the index the retriever searches"""
+    if isinstance(retriever, SharedIndexRetriever):
+        return retriever.manifest['dimension']
+
+    embeddings = retriever.vector_store.get(limit=1, include=['embeddings'])['embeddings']
+    if len(embeddings) == 0:
+        raise SystemExit("Vector store is empty. Please process documents first.")
+    return len(embeddings[0])
+
+def build_pipeline(vectors: Dict[str, List[float]], generation_delay_ms: float) -> RAGPipeline:
+    """Build a RAG pipeline over the configured index using local model stand-ins"""
+    embedding_function = CachedEmbeddings(vectors)
+
+    if SHARED_INDEX_CONFIG['enabled']:
+        retriever = SharedIndexRetriever(
+            index_directory=SHARED_INDEX_CONFIG['index_directory'],
+            google_api_key=GEMINI_API_KEY,
+            embedding_function=embedding_function
+        )
+    else:
+        retriever = Retriever(
+            persist_directory=VECTORSTORE_CONFIG['persist_directory'],
+            google_api_key=GEMINI_API_KEY,
+            embedding_function=embedding_function
+        )
+
+    # A mismatch would otherwise surface as a 500 on every replayed request
+    dimension = index_dimension(retriever)
+    sample = next(iter(vectors.values()), None)
+    if sample is not None and len(sample) != dimension:
+        raise SystemExit(
+            f"Cached query embeddings have dimension {len(sample)} but the index has {dimension}; "
+            "use a fresh --embeddings-cache for this index"
+        )
+
+    return RAGPipeline(
+        retriever=retriever,
+        google_api_key=GEMINI_API_KEY,
+        model=StubGenerativeModel(generation_delay_ms)
+    )
+
+async def replay(records: List[Dict[str, Any]], speed: float) -> List[Dict[str, Any]]:
+    """Send each record to /chat at its original offset divided by speed"""
+    traces = {}
+
+    def record_query(request: Request) -> RecordingQueryLogger:
+        return RecordingQueryLogger(traces, int(request.headers[REPLAY_ID_HEADER]))
+
+    app.dependency_overrides[get_query_logger] = record_query
+    results = []
+
+    async def send(client: httpx.AsyncClient, index: int, record: Dict[str, Any], delay: float) -> None:
+        await asyncio.sleep(delay)
+        start = time.perf_counter()
+        try:
+            response = await client.post(
+                '/chat',
+                json={'question': record['question']},
+                headers={REPLAY_ID_HEADER: str(index)}
+            )
+            status = response.status_code
+        except Exception as e:
+            logger.error(f"Error replaying query: {str(e)}")
+            status = None
+        results.append({
+            'index': index,
+            'question': record['question'],
+            'status': status,
+            'latency_ms': round((time.perf_counter() - start) * 1000, 2)
+        })
+
+    first_ts = records[0]['ts']
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://replay', timeout=None) as client:
+        await asyncio.gather(*[
+            send(client, index, record, (record['ts'] - first_ts) / speed)
+            for index, record in enumerate(records)
+        ])
+
+    results.sort(key=lambda result: result['index'])
+    for result in results:
+        trace = traces.get(result['index'], {})
+        result['chunk_ids'] = trace.get('chunk_ids', [])
+        result['scores'] = trace.get('scores', [])
+
+    return results
+
+def run(args: argparse.Namespace) -> None:
+    # Workers append concurrently, so restore arrival order before scheduling. Requests that
+    # failed in production are replayed too, since failures are part of the original traffic.
+    records = sorted(read_query_log(args.log), key=lambda record: record['ts'])
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        raise SystemExit(f"No replayable queries found in {args.log}")
+
+    cache_path = args.embeddings_cache or os.path.join(os.path.dirname(os.path.abspath(args.log)), 'query_embeddings.json')
+    vectors = prepare_embeddings(cache_path, (record['question'] for record in records))
+    pipeline = build_pipeline(vectors, args.generation_delay_ms)
+    app.dependency_overrides[get_rag_pipeline] = lambda: pipeline
+
+    logger.info(f"Replaying {len(records)} queries at {args.speed}x")
+    start = time.perf_counter()
+    results = asyncio.run(replay(records, args.speed))
+    elapsed = time.perf_counter() - start
+
+    for result, record in zip(results, records):
+        result['logged_chunk_ids'] = record.get('chunk_ids', [])
+        result['logged_error'] = record.get('error')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps(result, separators=(',', ':'), ensure_ascii=False) + '\n')
+
+    print(json.dumps(summarize_run(results, elapsed), indent=2))
+
+def summarize_run(results: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    """Latency, failures and agreement with the retrieval recorded in production"""
+    latencies = [result['latency_ms'] for result in results if result['status'] == 200]
+    # Only requests that succeeded both in production and in the replay have comparable retrievals
+    compared = [
+        result for result in results
+        if result['status'] == 200 and not result['logged_error'] and result['logged_chunk_ids']
+    ]
+    overlaps = [jaccard(result['logged_chunk_ids'], result['chunk_ids']) for result in compared]
+
+    return {
+        'requests': len(results),
+        'errors': len(results) - len(latencies),
+        'logged_errors': sum(1 for result in results if result['logged_error']),
+        'elapsed_s': round(elapsed, 2),
+        'throughput_rps': round(len(results) / elapsed, 2) if elapsed else None,
+        'latency_ms': latency_summary(latencies),
+        'vs_logged': {
+            'compared_queries': len(compared),
+            'identical_retrievals': sum(1 for result in compared if result['chunk_ids'] == result['logged_chunk_ids']),
+            'mean_jaccard': round(sum(overlaps) / len(overlaps), 4) if overlaps else None
+        }
+    }
+
+def load_report(path: str) -> List[Dict[str, Any]]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def diff(args: argparse.Namespace) -> None:
+    print(json.dumps(diff_reports(load_report(args.baseline), load_report(args.candidate), args.show), indent=2, ensure_ascii=False))
+
+def diff_reports(baseline: List[Dict[str, Any]], candidate: List[Dict[str, Any]], show: int = 10) -> Dict[str, Any]:
+    """Compare retrievals and latencies of two replay runs"""
+    # Results are matched by position in the replayed log, so repeated questions are compared individually
+    baseline_results = {result['index']: result for result in baseline}
+    candidate_results = {result['index']: result for result in candidate}
+
+    changed = []
+    overlaps = []
+    mismatched = 0
+    for index in sorted(baseline_results.keys() & candidate_results.keys()):
+        before, after = baseline_results[index], candidate_results[index]
+        if before['question'] != after['question']:
+            mismatched += 1
+            continue
+        before_ids, after_ids = before['chunk_ids'], after['chunk_ids']
+        overlaps.append(jaccard(before_ids, after_ids))
+        if before_ids != after_ids:
+            changed.append({'index': index, 'question': before['question'], 'baseline': before_ids, 'candidate': after_ids})
+
+    if mismatched:
+        logger.warning(f"{mismatched} results have different questions at the same position; were both runs made from the same log?")
+
+    def latencies(report: List[Dict[str, Any]]) -> List[float]:
+        return [result['latency_ms'] for result in report if result['status'] == 200]
+
+    return {
+        'compared_queries': len(overlaps),
+        'identical_retrievals': len(overlaps) - len(changed),
+        'mean_jaccard': round(sum(overlaps) / len(overlaps), 4) if overlaps else None,
+        'latency_ms': {
+            'baseline': latency_summary(latencies(baseline)),
+            'candidate': latency_summary(latencies(candidate))
+        },
+        'changed': changed[:show]
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay captured /chat traffic")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Replay a query log against the app")
+    run_parser.add_argument('log', help="Path to the query log (rotated backups are included)")
+    run_parser.add_argument('--speed', type=float, default=1.0, help="Rate multiplier over the original traffic")
+    run_parser.add_argument('--limit', type=int, default=0, help="Replay only the first N queries")
+    run_parser.add_argument('--output', help="Write per-query results to this file for diffing")
+    run_parser.add_argument('--generation-delay-ms', type=float, default=0.0, help="Latency of the stand-in model")
+    run_parser.add_argument('--embeddings-cache', help="Query embeddings file (default: query_embeddings.json next to the log)")
+    run_parser.set_defaults(func=run)
+
+    diff_parser = subparsers.add_parser('diff', help="Compare two replay results")
+    diff_parser.add_argument('baseline')
+    diff_parser.add_argument('candidate')
+    diff_parser.add_argument('--show', type=int, default=10, help="Number of changed queries to list")
+    diff_parser.set_defaults(func=diff)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    logging.config.dictConfig(LOGGING_CONFIG)
+    main()
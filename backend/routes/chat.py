@@ -1,4 +1,5 @@
 import logging
+import time
 from typing import Dict, Any
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
@@ -7,6 +8,7 @@ from pydantic import BaseModel
 logger = logging.getLogger(__name__)
 
 from services.rag import get_rag_pipeline
+from services.query_log import get_query_logger
 from config import GEMINI_API_KEY
 
 router = APIRouter()
@@ -20,10 +22,14 @@ class ChatResponse(BaseModel):
     confidence: str
 
 @router.post('', response_model=ChatResponse)
-async def chat(request: ChatRequest, rag_pipeline = Depends(get_rag_pipeline)):
+async def chat(request: ChatRequest, rag_pipeline = Depends(get_rag_pipeline), query_logger = Depends(get_query_logger)):
     """Chat with the RAG pipeline"""
+    received_at = time.time()
+    start = time.perf_counter()
     try:
         result = await rag_pipeline.answer_question(request.question)
+        if query_logger is not None:
+            query_logger.log(request.question, result['trace'], received_at, (time.perf_counter() - start) * 1000)
         return ChatResponse(
             answer=result['answer'],
             sources=result['sources'],
@@ -31,4 +37,6 @@ async def chat(request: ChatRequest, rag_pipeline = Depends(get_rag_pipeline)):
         )
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}")
+        if query_logger is not None:
+            query_logger.log(request.question, getattr(e, 'trace', {}), received_at, (time.perf_counter() - start) * 1000, error=str(e))
         raise HTTPException(status_code=500, detail=f"Failed to process chat request: {str(e)}")
\ No newline at end of file
@@ -1,16 +1,17 @@
 import logging
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 import fitz  # PyMuPDF
 import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
+from langchain_chroma import Chroma
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_community.document_loaders import TextLoader
 from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
 import chromadb
 
 from config import GEMINI_API_KEY, VECTORSTORE_CONFIG, MODEL_CONFIG
@@ -373,10 +374,10 @@ def process_all() -> None:
 
 
 class Retriever:
-    def __init__(self, persist_directory: str, google_api_key: str):
+    def __init__(self, persist_directory: str, google_api_key: str, embedding_function: Optional[Embeddings] = None):
         self.vector_store = Chroma(
             persist_directory=persist_directory,
-            embedding_function=GoogleGenerativeAIEmbeddings(
+            embedding_function=embedding_function or GoogleGenerativeAIEmbeddings(
                 model="models/embedding-001",
                 google_api_key=google_api_key
             ),
@@ -389,9 +390,12 @@ class Retriever:
     
     async def get_relevant_documents(self, query: str, k: int = 4) -> List[Any]:
         """Retrieve relevant documents for a given query using similarity search"""
+        return [doc for doc, _ in await self.get_relevant_documents_with_scores(query, k=k)]
+    
+    async def get_relevant_documents_with_scores(self, query: str, k: int = 4) -> List[Tuple[Any, float]]:
+        """Retrieve relevant documents with their distance scores (lower is closer)"""
         try:
-            documents = self.vector_store.similarity_search(query, k=k)
-            return documents
+            return self.vector_store.similarity_search_with_score(query, k=k)
         except Exception as e:
             logger.error(f"Error retrieving documents: {str(e)}")
             raise
\ No newline at end of file
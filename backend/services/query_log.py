@@ -0,0 +1,105 @@
+import glob
+import json
+import logging
+import os
+from logging.handlers import RotatingFileHandler
+from typing import Optional, Dict, Any, Iterator
+
+import portalocker
+
+from config import QUERY_LOG_CONFIG
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class LockedRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that several worker processes can share.
+
+    Each write, including any rollover, happens under an exclusive lock on a
+    sidecar file, and the log is reopened for every record so no process keeps
+    writing to a file another one has rotated away.
+    """
+
+    def __init__(self, filename: str, max_bytes: int, backup_count: int, lock_timeout: float = 10):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        self.lock_path = f"{self.baseFilename}.lock"
+        self.lock_timeout = lock_timeout
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            with portalocker.Lock(self.lock_path, timeout=self.lock_timeout):
+                super().emit(record)
+                if self.stream is not None:
+                    self.stream.close()
+                    self.stream = None
+        except Exception:
+            self.handleError(record)
+
+class QueryLogger:
+    """Writes one compact JSON line per chat request to a rotating file shared by all workers"""
+
+    def __init__(self, path: str, max_bytes: int, backup_count: int):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        handler = LockedRotatingFileHandler(self.path, max_bytes=max_bytes, backup_count=backup_count)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+
+        # Dedicated logger so records never reach the application log handlers
+        self._logger = logging.getLogger(f"query_log.{os.path.abspath(self.path)}")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        self._logger.handlers = [handler]
+
+    def log(self, question: str, trace: Dict[str, Any], received_at: float, total_ms: float, error: Optional[str] = None) -> None:
+        """Record a single query with its arrival time, retrieval results, timings and token counts"""
+        record = {
+            'ts': received_at,
+            'question': question,
+            'chunk_ids': trace.get('chunk_ids', []),
+            'scores': trace.get('scores', []),
+            'timings_ms': {**trace.get('timings_ms', {}), 'total': round(total_ms, 2)},
+            'tokens': trace.get('tokens', {})
+        }
+        if error:
+            record['error'] = error
+        try:
+            self._logger.info(json.dumps(record, separators=(',', ':'), ensure_ascii=False))
+        except Exception as e:
+            logger.error(f"Error writing query log: {str(e)}")
+
+def read_query_log(path: str) -> Iterator[Dict[str, Any]]:
+    """Read records from a query log and its rotated backups, oldest file first.
+
+    Workers append concurrently, so records are only roughly ordered; sort by `ts` for arrival order.
+    """
+    backups = [
+        file_path for file_path in glob.glob(f"{glob.escape(path)}.*")
+        if file_path.rsplit('.', 1)[-1].isdigit()
+    ]
+    backups.sort(key=lambda file_path: int(file_path.rsplit('.', 1)[-1]), reverse=True)
+
+    for file_path in backups + ([path] if os.path.exists(path) else []):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+# Global query logger, created on first use when enabled. The dependency is async so it
+# runs on the event loop rather than a threadpool, and only one logger is ever created.
+query_logger = None
+
+async def get_query_logger() -> Optional[QueryLogger]:
+    """Get the query logger, or None when query logging is disabled"""
+    global query_logger
+
+    if not QUERY_LOG_CONFIG['enabled']:
+        return None
+
+    if query_logger is None:
+        query_logger = QueryLogger(
+            path=QUERY_LOG_CONFIG['path'],
+            max_bytes=QUERY_LOG_CONFIG['max_bytes'],
+            backup_count=QUERY_LOG_CONFIG['backup_count']
+        )
+
+    return query_logger
@@ -1,10 +1,12 @@
 import logging
-from typing import Optional, List, Dict, Any
+import time
+from typing import Optional, List, Dict, Any, Union
 from fastapi import HTTPException
 import google.generativeai as genai
 
 from .document_processor import VectorStoreManager, Retriever
-from config import GEMINI_API_KEY, VECTORSTORE_CONFIG
+from .shared_index import SharedIndexRetriever
+from config import GEMINI_API_KEY, VECTORSTORE_CONFIG, SHARED_INDEX_CONFIG
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -12,16 +14,35 @@ logger = logging.getLogger(__name__)
 class RAGPipeline:
     """RAG Pipeline for question answering using Gemini and vector store retrieval"""
     
-    def __init__(self, retriever: Retriever, google_api_key: str):
+    def __init__(self, retriever: Union[Retriever, SharedIndexRetriever], google_api_key: str, model: Optional[Any] = None):
         """Initialize the RAG pipeline"""
         self.retriever = retriever
-        genai.configure(api_key=google_api_key)
-        self.model = genai.GenerativeModel('models/gemini-2.0-flash')
+        if model is None:
+            genai.configure(api_key=google_api_key)
+            model = genai.GenerativeModel('models/gemini-2.0-flash')
+        self.model = model
         
     async def answer_question(self, question: str) -> Dict[str, Any]:
-        """Answer a question using RAG"""
+        """Answer a question using RAG, returning the retrieval trace alongside the answer"""
+        trace = {"chunk_ids": [], "scores": [], "timings_ms": {}, "tokens": {}}
+        try:
+            result = await self._answer_question(question, trace)
+        except Exception as e:
+            # Keep whatever was traced before the failure so the caller can still log it
+            e.trace = trace
+            raise
+        result["trace"] = trace
+        return result
+
+    async def _answer_question(self, question: str, trace: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer a question using RAG, filling in the trace as each stage completes"""
         # Retrieve relevant documents
-        relevant_docs = await self.retriever.get_relevant_documents(question)
+        start = time.perf_counter()
+        results = await self.retriever.get_relevant_documents_with_scores(question)
+        relevant_docs = [doc for doc, _ in results]
+        trace["chunk_ids"] = [doc.id for doc in relevant_docs]
+        trace["scores"] = [round(float(score), 6) for _, score in results]
+        trace["timings_ms"]["retrieval"] = round((time.perf_counter() - start) * 1000, 2)
 
         if not relevant_docs:
             return {
@@ -38,7 +59,18 @@ class RAGPipeline:
         )
 
         # Generate response using Gemini
-        response = self.model.generate_content(prompt)
+        start = time.perf_counter()
+        try:
+            response = self.model.generate_content(prompt)
+        finally:
+            trace["timings_ms"]["generation"] = round((time.perf_counter() - start) * 1000, 2)
+
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None:
+            trace["tokens"] = {
+                "prompt": usage.prompt_token_count,
+                "completion": usage.candidates_token_count
+            }
 
         # Handle empty or unhelpful responses
         if not response.text or "i don't know" in response.text.strip().lower():
@@ -71,6 +103,24 @@ async def get_rag_pipeline() -> RAGPipeline:
         if not GEMINI_API_KEY:
             raise HTTPException(status_code=500, detail="GEMINI API key not configured")
             
+        if SHARED_INDEX_CONFIG['enabled']:
+            # Attach to the index published by the loader process
+            try:
+                retriever = SharedIndexRetriever(
+                    index_directory=SHARED_INDEX_CONFIG['index_directory'],
+                    google_api_key=GEMINI_API_KEY
+                )
+            except FileNotFoundError:
+                raise HTTPException(
+                    status_code=404,
+                    detail="Shared index not found. Please run `python -m services.shared_index` first."
+                )
+            rag_pipeline = RAGPipeline(
+                retriever=retriever,
+                google_api_key=GEMINI_API_KEY
+            )
+            return rag_pipeline
+
         # Initialize vector store manager
         vector_store_manager = VectorStoreManager(
             google_api_key=GEMINI_API_KEY,
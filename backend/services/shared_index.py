@@ -0,0 +1,202 @@
+import json
+import logging
+import mmap
+import os
+import shutil
+from datetime import datetime
+from typing import List, Any, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+from .document_processor import VectorStoreManager
+from config import GEMINI_API_KEY, VECTORSTORE_CONFIG, SHARED_INDEX_CONFIG
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Files making up a published index
+EMBEDDINGS_FILE = 'embeddings.npy'
+NORMS_FILE = 'norms.npy'
+OFFSETS_FILE = 'offsets.npy'
+CHUNKS_FILE = 'chunks.bin'
+MANIFEST_FILE = 'manifest.json'
+
+# Names the current version where symlinks are unavailable (Windows without Developer Mode)
+POINTER_SUFFIX = '.current'
+
+def resolve_index_directory(index_directory: str) -> str:
+    """Directory holding the currently published version of the index"""
+    if os.path.islink(index_directory):
+        return os.path.realpath(index_directory)
+
+    pointer_path = f"{index_directory}{POINTER_SUFFIX}"
+    if os.path.exists(pointer_path):
+        with open(pointer_path, 'r', encoding='utf-8') as f:
+            version_name = f.read().strip()
+        return os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(index_directory)), version_name))
+
+    return os.path.realpath(index_directory)
+
+def publish_shared_index(persist_directory: str, index_directory: str, google_api_key: str) -> int:
+    """Export the Chroma collection into read-only files that workers can mmap"""
+    vector_store_manager = VectorStoreManager(
+        google_api_key=google_api_key,
+        persist_directory=persist_directory
+    )
+    vectorstore = vector_store_manager.load_chroma_db()
+    data = vectorstore.get(include=['embeddings', 'documents', 'metadatas'])
+
+    ids = data['ids']
+    if not ids:
+        raise ValueError("Vector store is empty. Please process documents first.")
+
+    embeddings = np.ascontiguousarray(data['embeddings'], dtype=np.float32)
+    norms = np.einsum('ij,ij->i', embeddings, embeddings).astype(np.float32)
+
+    # Each publish goes to its own versioned directory; index_directory is a symlink to the current one,
+    # or a pointer file names it where symlinks cannot be created
+    version = datetime.now().strftime('%Y%m%d%H%M%S%f')
+    version_directory = f"{index_directory}.{version}"
+    os.makedirs(version_directory)
+
+    # Chunk text and metadata are stored as one JSON line per chunk, addressed by byte offsets
+    offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+
+    with open(os.path.join(version_directory, CHUNKS_FILE), 'wb') as f:
+        for i, (chunk_id, text, metadata) in enumerate(zip(ids, data['documents'], data['metadatas'])):
+            line = json.dumps({
+                'id': chunk_id,
+                'page_content': text,
+                'metadata': metadata or {}
+            }).encode('utf-8') + b'\n'
+            f.write(line)
+            offsets[i + 1] = offsets[i] + len(line)
+
+    np.save(os.path.join(version_directory, EMBEDDINGS_FILE), embeddings)
+    np.save(os.path.join(version_directory, NORMS_FILE), norms)
+    np.save(os.path.join(version_directory, OFFSETS_FILE), offsets)
+
+    with open(os.path.join(version_directory, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': version,
+            'count': len(ids),
+            'dimension': int(embeddings.shape[1]),
+            'chunks_bytes': int(offsets[-1]),
+            'source': persist_directory
+        }, f)
+
+    previous_directory = resolve_index_directory(index_directory)
+    if os.path.isdir(index_directory) and not os.path.islink(index_directory):
+        # Index published by an older layout as a plain directory; move it aside so the link can replace it
+        previous_directory = os.path.realpath(f"{index_directory}.legacy")
+        shutil.rmtree(previous_directory, ignore_errors=True)
+        os.replace(index_directory, previous_directory)
+
+    # Renaming a symlink or pointer file over the old one is atomic, so workers see either the old or the new version
+    pointer_path = f"{index_directory}{POINTER_SUFFIX}"
+    link_path = f"{index_directory}.link"
+    if os.path.lexists(link_path):
+        os.remove(link_path)
+    try:
+        os.symlink(os.path.basename(version_directory), link_path)
+    except OSError:
+        with open(f"{pointer_path}.tmp", 'w', encoding='utf-8') as f:
+            f.write(os.path.basename(version_directory))
+        os.replace(f"{pointer_path}.tmp", pointer_path)
+    else:
+        os.replace(link_path, index_directory)
+        if os.path.exists(pointer_path):
+            os.remove(pointer_path)
+
+    # Keep the version just replaced for workers still attaching to it; drop anything older
+    parent_directory = os.path.dirname(os.path.abspath(index_directory))
+    prefix = f"{os.path.basename(index_directory)}."
+    keep = (os.path.realpath(version_directory), previous_directory)
+    for name in os.listdir(parent_directory):
+        path = os.path.join(parent_directory, name)
+        if (name.startswith(prefix) and os.path.isdir(path) and not os.path.islink(path)
+                and os.path.realpath(path) not in keep):
+            shutil.rmtree(path, ignore_errors=True)
+
+    logger.info(f"Published shared index with {len(ids)} chunks to {index_directory}")
+    return len(ids)
+
+class SharedIndexRetriever:
+    """Retriever that searches a published index through read-only memory maps.
+
+    Every worker maps the same files, so the page cache holds a single copy of
+    the embedding matrix and chunk data regardless of the number of workers.
+    Search is an exact scan of the matrix, O(N·d) per query, rather than
+    Chroma's approximate HNSW lookup; this suits corpora up to a few hundred
+    thousand chunks.
+    """
+
+    def __init__(self, index_directory: str, google_api_key: str, embedding_function: Optional[Embeddings] = None):
+        # Resolve the current version once so every file comes from the same publish
+        index_directory = resolve_index_directory(index_directory)
+        manifest_path = os.path.join(index_directory, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"Shared index not found: {index_directory}")
+
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+
+        self.embeddings = np.load(os.path.join(index_directory, EMBEDDINGS_FILE), mmap_mode='r')
+        self.norms = np.load(os.path.join(index_directory, NORMS_FILE), mmap_mode='r')
+        self.offsets = np.load(os.path.join(index_directory, OFFSETS_FILE), mmap_mode='r')
+
+        with open(os.path.join(index_directory, CHUNKS_FILE), 'rb') as f:
+            self.chunks = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        count, dimension = self.manifest['count'], self.manifest['dimension']
+        if (self.embeddings.shape != (count, dimension) or self.norms.shape != (count,)
+                or self.offsets.shape != (count + 1,) or int(self.offsets[-1]) != self.manifest['chunks_bytes']
+                or len(self.chunks) != self.manifest['chunks_bytes']):
+            raise ValueError(f"Shared index files do not match their manifest: {index_directory}")
+
+        self.embedding_function = embedding_function or GoogleGenerativeAIEmbeddings(
+            model="models/embedding-001",
+            google_api_key=google_api_key
+        )
+        logger.info(f"Attached to shared index version {self.manifest['version']} with {count} chunks")
+
+    def _load_chunk(self, index: int) -> Document:
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        chunk = json.loads(self.chunks[start:end])
+        return Document(id=chunk['id'], page_content=chunk['page_content'], metadata=chunk['metadata'])
+
+    def search(self, query_embedding: List[float], k: int = 4) -> List[Tuple[int, float]]:
+        """Return (index, distance) of the k nearest chunks by squared L2 distance, as Chroma does"""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        distances = self.norms - 2.0 * (self.embeddings @ query) + float(query @ query)
+        k = min(k, len(distances))
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest])]
+        return [(int(i), float(distances[i])) for i in nearest]
+
+    async def get_relevant_documents(self, query: str, k: int = 4) -> List[Any]:
+        """Retrieve relevant documents for a given query using similarity search"""
+        return [doc for doc, _ in await self.get_relevant_documents_with_scores(query, k=k)]
+
+    async def get_relevant_documents_with_scores(self, query: str, k: int = 4) -> List[Tuple[Any, float]]:
+        """Retrieve relevant documents with their distance scores (lower is closer)"""
+        try:
+            query_embedding = self.embedding_function.embed_query(query)
+            return [(self._load_chunk(i), distance) for i, distance in self.search(query_embedding, k=k)]
+        except Exception as e:
+            logger.error(f"Error retrieving documents: {str(e)}")
+            raise
+
+if __name__ == "__main__":
+    import logging.config
+    from config import LOGGING_CONFIG
+
+    logging.config.dictConfig(LOGGING_CONFIG)
+    publish_shared_index(
+        persist_directory=VECTORSTORE_CONFIG['persist_directory'],
+        index_directory=SHARED_INDEX_CONFIG['index_directory'],
+        google_api_key=GEMINI_API_KEY
+    )
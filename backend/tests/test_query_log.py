@@ -0,0 +1,90 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+
+from main import app
+from services.query_log import QueryLogger, read_query_log, get_query_logger
+from services.rag import RAGPipeline, get_rag_pipeline
+from replay import StubGenerativeModel
+
+class StubRetriever:
+    async def get_relevant_documents_with_scores(self, query, k=4):
+        return [
+            (Document(id='chunk-1', page_content="Claims are settled in 30 days."), 0.25),
+            (Document(id='chunk-2', page_content="Premiums are due monthly."), 0.5)
+        ]
+
+class FailingModel:
+    def generate_content(self, prompt):
+        raise RuntimeError("generation failed")
+
+@pytest.fixture
+def query_logger(tmp_path):
+    return QueryLogger(str(tmp_path / 'queries.jsonl'), max_bytes=10 * 1024 * 1024, backup_count=2)
+
+@pytest.fixture
+def client(query_logger):
+    async def override_query_logger():
+        return query_logger
+
+    app.dependency_overrides[get_query_logger] = override_query_logger
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+def use_pipeline(model):
+    pipeline = RAGPipeline(retriever=StubRetriever(), google_api_key=None, model=model)
+    app.dependency_overrides[get_rag_pipeline] = lambda: pipeline
+
+def test_chat_logs_trace_on_success(client, query_logger):
+    use_pipeline(StubGenerativeModel(delay_ms=0))
+    response = client.post('/chat', json={'question': "How long do claims take?"})
+
+    assert response.status_code == 200
+    [record] = list(read_query_log(query_logger.path))
+    assert record['question'] == "How long do claims take?"
+    assert record['chunk_ids'] == ['chunk-1', 'chunk-2']
+    assert record['scores'] == [0.25, 0.5]
+    assert set(record['timings_ms']) == {'retrieval', 'generation', 'total'}
+    assert record['tokens']['completion'] == 2
+    assert 'error' not in record
+
+def test_chat_logs_retrieval_when_generation_fails(client, query_logger):
+    use_pipeline(FailingModel())
+    response = client.post('/chat', json={'question': "How long do claims take?"})
+
+    assert response.status_code == 500
+    [record] = list(read_query_log(query_logger.path))
+    assert record['error'] == "generation failed"
+    assert record['chunk_ids'] == ['chunk-1', 'chunk-2']
+    assert 'generation' in record['timings_ms']
+
+def test_answer_question_attaches_partial_trace_to_errors():
+    pipeline = RAGPipeline(retriever=StubRetriever(), google_api_key=None, model=FailingModel())
+
+    with pytest.raises(RuntimeError) as excinfo:
+        asyncio.run(pipeline.answer_question("How long do claims take?"))
+
+    assert excinfo.value.trace['chunk_ids'] == ['chunk-1', 'chunk-2']
+    assert excinfo.value.trace['tokens'] == {}
+
+def test_read_query_log_orders_backups_oldest_first(tmp_path):
+    path = tmp_path / 'queries.jsonl'
+    for suffix, question in [('.2', 'oldest'), ('.1', 'older'), ('', 'newest')]:
+        (tmp_path / f"queries.jsonl{suffix}").write_text(json.dumps({'question': question}) + '\n')
+    (tmp_path / 'queries.jsonl.lock').write_text('')
+
+    assert [record['question'] for record in read_query_log(str(path))] == ['oldest', 'older', 'newest']
+
+def test_loggers_sharing_a_file_rotate_under_one_size_limit(tmp_path):
+    path = str(tmp_path / 'queries.jsonl')
+    # Two loggers on the same file stand in for two worker processes
+    workers = [QueryLogger(path, max_bytes=2000, backup_count=50) for _ in range(2)]
+    for i in range(100):
+        workers[i % 2].log(f"question {i}", {}, received_at=float(i), total_ms=1.0)
+
+    records = list(read_query_log(path))
+    assert sorted(record['ts'] for record in records) == [float(i) for i in range(100)]
+    assert all(size <= 2000 for size in (f.stat().st_size for f in tmp_path.glob('queries.jsonl*')))
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import replay
+from main import app
+from services.rag import RAGPipeline, get_rag_pipeline
+
+class CountingRetriever:
+    """Returns a different chunk on every call, so each request's trace is distinguishable"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def get_relevant_documents_with_scores(self, query, k=4):
+        self.calls += 1
+        return [(Document(id=f"chunk-{self.calls}", page_content=query), 0.1)]
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: int = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return super().embed_query(text)
+
+@pytest.fixture(autouse=True)
+def clear_overrides():
+    yield
+    app.dependency_overrides.clear()
+
+def test_percentile_is_nearest_rank():
+    assert replay.percentile([5, 1, 4, 2, 3], 50) == 3
+    assert replay.percentile([1, 2, 3, 4, 5], 99) == 5
+    assert replay.percentile([7], 90) == 7
+    assert replay.percentile([], 50) is None
+
+def test_replay_attaches_each_trace_to_its_own_request():
+    pipeline = RAGPipeline(retriever=CountingRetriever(), google_api_key=None, model=replay.StubGenerativeModel(0))
+    app.dependency_overrides[get_rag_pipeline] = lambda: pipeline
+    records = [{'ts': float(i), 'question': "How do I file a claim?"} for i in range(3)]
+
+    results = asyncio.run(replay.replay(records, speed=100))
+
+    assert [result['index'] for result in results] == [0, 1, 2]
+    assert all(result['status'] == 200 for result in results)
+    assert sorted(result['chunk_ids'][0] for result in results) == ['chunk-1', 'chunk-2', 'chunk-3']
+
+def test_diff_matches_results_by_position():
+    baseline = [
+        {'index': 0, 'question': 'q', 'status': 200, 'latency_ms': 10.0, 'chunk_ids': ['a', 'b']},
+        {'index': 1, 'question': 'q', 'status': 200, 'latency_ms': 12.0, 'chunk_ids': ['a', 'b']},
+        {'index': 2, 'question': 'r', 'status': 200, 'latency_ms': 14.0, 'chunk_ids': ['c']}
+    ]
+    candidate = [
+        {'index': 0, 'question': 'q', 'status': 200, 'latency_ms': 9.0, 'chunk_ids': ['a', 'b']},
+        {'index': 1, 'question': 'q', 'status': 200, 'latency_ms': 11.0, 'chunk_ids': ['a', 'c']},
+        {'index': 2, 'question': 'other', 'status': 200, 'latency_ms': 13.0, 'chunk_ids': ['c']}
+    ]
+
+    report = replay.diff_reports(baseline, candidate)
+
+    assert report['compared_queries'] == 2
+    assert report['identical_retrievals'] == 1
+    assert [change['index'] for change in report['changed']] == [1]
+    assert report['mean_jaccard'] == round((1 + 1 / 3) / 2, 4)
+
+def test_summary_compares_with_logged_retrieval_and_counts_logged_errors():
+    results = [
+        {'status': 200, 'latency_ms': 5.0, 'chunk_ids': ['a', 'b'], 'logged_chunk_ids': ['a', 'b'], 'logged_error': None},
+        {'status': 200, 'latency_ms': 6.0, 'chunk_ids': ['a', 'c'], 'logged_chunk_ids': ['a', 'b'], 'logged_error': None},
+        {'status': 200, 'latency_ms': 7.0, 'chunk_ids': ['a'], 'logged_chunk_ids': ['a'], 'logged_error': 'generation failed'},
+        {'status': 500, 'latency_ms': 8.0, 'chunk_ids': [], 'logged_chunk_ids': ['d'], 'logged_error': None}
+    ]
+
+    summary = replay.summarize_run(results, elapsed=1.0)
+
+    assert summary['errors'] == 1
+    assert summary['logged_errors'] == 1
+    assert summary['vs_logged'] == {'compared_queries': 2, 'identical_retrievals': 1, 'mean_jaccard': round((1 + 1 / 3) / 2, 4)}
+
+def test_prepare_embeddings_embeds_each_question_once(tmp_path):
+    cache_path = str(tmp_path / 'query_embeddings.json')
+    embeddings = CountingEmbeddings(size=8)
+
+    first = replay.prepare_embeddings(cache_path, ['a', 'b', 'a'], embeddings)
+    second = replay.prepare_embeddings(cache_path, ['a', 'b'], embeddings)
+
+    assert embeddings.calls == 2
+    assert second == first
+    assert replay.CachedEmbeddings(second).embed_query('a') == first['a']
+    with pytest.raises(KeyError):
+        replay.CachedEmbeddings(second).embed_query('unseen')
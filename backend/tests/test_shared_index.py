@@ -0,0 +1,81 @@
+import asyncio
+import os
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import services.document_processor as document_processor
+import services.shared_index as shared_index
+
+EMBEDDINGS = DeterministicFakeEmbedding(size=32)
+
+@pytest.fixture
+def vector_store_manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(document_processor, 'GoogleGenerativeAIEmbeddings', lambda **kwargs: EMBEDDINGS)
+    manager = document_processor.VectorStoreManager(
+        google_api_key='test',
+        persist_directory=str(tmp_path / 'chroma_db')
+    )
+    manager.create_chroma_db([
+        Document(page_content=f"Policy clause {i}", metadata={'source': f"policy_{i % 3}.txt"})
+        for i in range(30)
+    ])
+    return manager
+
+def publish(tmp_path):
+    index_directory = str(tmp_path / 'shared_index')
+    shared_index.publish_shared_index(str(tmp_path / 'chroma_db'), index_directory, 'test')
+    return index_directory
+
+def version_directories(tmp_path):
+    return sorted(
+        entry.name for entry in os.scandir(tmp_path)
+        if entry.name.startswith('shared_index.') and entry.is_dir(follow_symlinks=False)
+    )
+
+def ranked(results):
+    # Equal distances may come back in either order
+    return sorted((round(score, 4), doc.id) for doc, score in results)
+
+def test_search_matches_chroma(tmp_path, vector_store_manager):
+    retriever = shared_index.SharedIndexRetriever(publish(tmp_path), 'test', embedding_function=EMBEDDINGS)
+    vectorstore = vector_store_manager.load_chroma_db()
+
+    for query in ['Policy clause 7', 'claim settlement', 'premium']:
+        results = asyncio.run(retriever.get_relevant_documents_with_scores(query, k=5))
+        expected = vectorstore.similarity_search_with_score(query, k=5)
+        assert ranked(results) == ranked(expected)
+        assert [doc.page_content for doc, _ in results][0] == expected[0][0].page_content
+
+def test_publish_keeps_current_and_previous_versions(tmp_path, vector_store_manager):
+    index_directory = publish(tmp_path)
+    publish(tmp_path)
+    publish(tmp_path)
+
+    versions = version_directories(tmp_path)
+    assert len(versions) == 2
+    assert os.path.islink(index_directory)
+    assert os.path.realpath(index_directory) == os.path.realpath(tmp_path / versions[-1])
+
+def test_publish_falls_back_to_pointer_file_without_symlinks(tmp_path, vector_store_manager, monkeypatch):
+    def symlink(*args, **kwargs):
+        raise OSError("A required privilege is not held by the client")
+
+    monkeypatch.setattr(shared_index.os, 'symlink', symlink)
+    index_directory = publish(tmp_path)
+    publish(tmp_path)
+
+    versions = version_directories(tmp_path)
+    assert len(versions) == 2
+    assert not os.path.lexists(index_directory)
+    retriever = shared_index.SharedIndexRetriever(index_directory, 'test', embedding_function=EMBEDDINGS)
+    assert f"shared_index.{retriever.manifest['version']}" == versions[-1]
+
+def test_rejects_files_that_do_not_match_manifest(tmp_path, vector_store_manager):
+    index_directory = publish(tmp_path)
+    with open(os.path.join(os.path.realpath(index_directory), shared_index.CHUNKS_FILE), 'ab') as f:
+        f.write(b'{}\n')
+
+    with pytest.raises(ValueError):
+        shared_index.SharedIndexRetriever(index_directory, 'test', embedding_function=EMBEDDINGS)